@@ -1,13 +1,16 @@
 """Database utilities: connection helpers, schema creation, seed data."""
 from __future__ import annotations
 
+import atexit
 import hashlib
 import logging
 import os
 import sqlite3
+import threading
+import weakref
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Callable, Iterable, List, Tuple
 
 try:
     from dotenv import load_dotenv
@@ -23,26 +26,113 @@ DB_PATH = Path(os.getenv("DB_PATH", DEFAULT_DB_PATH))
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 logger = logging.getLogger(__name__)
 
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA cache_size=-64000;",
+    "PRAGMA mmap_size=268435456;",
+    "PRAGMA foreign_keys=ON;",
+)
+SCHEMA_VERSION = 2
+STATEMENT_CACHE_SIZE = 256
+_local = threading.local()
+_users_changed_hooks: List[Callable[[], None]] = []
 
-@contextmanager
-def get_connection():
-    """Context manager yielding sqlite3 connection with row factory."""
-    conn = sqlite3.connect(DB_PATH)
+
+class _ThreadConnection:
+    """Owns one thread's connection; closes it when the thread's locals are dropped.
+
+    Streamlit runs every rerun on a fresh thread, so connections must not outlive
+    their thread. sqlite3 connections sit in reference cycles and would otherwise
+    wait for the cyclic GC.
+    """
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __del__(self) -> None:
+        try:
+            self.conn.close()
+        except sqlite3.Error:  # pragma: no cover - best effort
+            pass
+
+
+# Live threads' connections only, for the shutdown PRAGMA optimize.
+_connections: "weakref.WeakSet[_ThreadConnection]" = weakref.WeakSet()
+_connections_lock = threading.Lock()
+
+
+def _open_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _thread_connection() -> sqlite3.Connection:
+    """Return this thread's cached connection, opening it on first use."""
+    owner = getattr(_local, "owner", None)
+    if owner is None:
+        owner = _ThreadConnection(_open_connection())
+        with _connections_lock:
+            _connections.add(owner)
+        _local.owner = owner
+    return owner.conn
+
+
+@contextmanager
+def get_connection(write: bool = False):
+    """Context manager yielding the thread's cached connection inside a transaction.
+
+    Pass ``write=True`` for transactions that modify data: they start with
+    BEGIN IMMEDIATE, taking the write lock up front. A deferred transaction that
+    reads first fails with SQLITE_BUSY_SNAPSHOT under WAL if another connection
+    commits before its first write, and the busy timeout does not retry that.
+    Nested use on the same thread joins the outer transaction.
+    """
+    conn = _thread_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
     try:
         yield conn
-        conn.commit()
-    finally:
-        conn.close()
+    except GeneratorExit:
+        # An enclosing generator was closed early; that is not a failure.
+        conn.execute("COMMIT")
+        raise
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def get_read_connection() -> sqlite3.Connection:
+    """Return the thread's cached connection for a lazily consumed read.
+
+    No transaction is opened: each SELECT runs in SQLite's implicit read
+    transaction, so writes made while its cursor is pending commit normally.
+    """
+    return _thread_connection()
 
 
 def create_tables() -> None:
-    """Create users, patients, logs tables if they do not exist."""
+    """Create users, patients, logs tables and the patients_anon view if missing."""
     users_sql = """
     CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT NOT NULL UNIQUE,
-        password TEXT NOT NULL,
+        password BLOB NOT NULL,
         role TEXT NOT NULL CHECK(role IN ('admin', 'doctor', 'receptionist')),
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
@@ -53,7 +143,7 @@ def create_tables() -> None:
         patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL,
         contact TEXT NOT NULL,
-        diagnosis TEXT NOT NULL,
+        diagnosis BLOB NOT NULL,
         anonymized_name TEXT NOT NULL,
         anonymized_contact TEXT NOT NULL,
         diagnosis_masked TEXT NOT NULL,
@@ -76,20 +166,63 @@ def create_tables() -> None:
 
     indexes_sql = [
         "CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name);",
+        # Covers the patients_anon projection, so anonymized lists never touch
+        # table pages (patient_id is the rowid); also orders raw listings.
+        "DROP INDEX IF EXISTS idx_patients_date_added;",
+        """CREATE INDEX IF NOT EXISTS idx_patients_anon_by_date ON patients(
+            date_added DESC, anonymized_name, anonymized_contact, diagnosis_masked
+        );""",
         "CREATE INDEX IF NOT EXISTS idx_logs_user_id ON logs(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_logs_role ON logs(role);",
+        # Search uses LIKE '%term%', which no B-tree index can serve.
+        "DROP INDEX IF EXISTS idx_patients_anon_name;",
+        "DROP INDEX IF EXISTS idx_patients_diag_masked;",
     ]
 
-    with get_connection() as conn:
+    patients_anon_sql = """
+    CREATE VIEW IF NOT EXISTS patients_anon AS
+    SELECT patient_id, anonymized_name, anonymized_contact, diagnosis_masked, date_added
+    FROM patients;
+    """
+
+    with get_connection(write=True) as conn:
         cursor = conn.cursor()
         cursor.execute(users_sql)
         cursor.execute(patients_sql)
         cursor.execute(logs_sql)
         for stmt in indexes_sql:
             cursor.execute(stmt)
+        cursor.execute(patients_anon_sql)
+
 
+@atexit.register
+def _close_connections() -> None:
+    """Refresh planner statistics and close every pooled connection."""
+    with _connections_lock:
+        pooled = list(_connections)
+        _connections.clear()
+    for owner in pooled:
+        try:
+            owner.conn.execute("PRAGMA optimize;")
+            owner.conn.close()
+        except sqlite3.Error:  # pragma: no cover - best effort at shutdown
+            logger.exception("Failed to close database connection")
 
-def _hash_password(raw_password: str) -> str:
-    return hashlib.sha256(raw_password.encode("utf-8")).hexdigest()
+
+def on_users_changed(hook: Callable[[], None]) -> Callable[[], None]:
+    """Register ``hook`` to run after this module writes to the users table."""
+    _users_changed_hooks.append(hook)
+    return hook
+
+
+def _notify_users_changed() -> None:
+    for hook in _users_changed_hooks:
+        hook()
+
+
+def _hash_password(raw_password: str) -> bytes:
+    return hashlib.sha256(raw_password.encode("utf-8")).digest()
 
 
 def seed_users() -> None:
@@ -108,7 +241,7 @@ def seed_users() -> None:
         ),
     ]
 
-    with get_connection() as conn:
+    with get_connection(write=True) as conn:
         cursor = conn.cursor()
         for username, password, role in default_users:
             cursor.execute(
@@ -119,11 +252,41 @@ def seed_users() -> None:
                 """,
                 (username.lower(), _hash_password(password), role),
             )
+    _notify_users_changed()
+
+
+def migrate_schema() -> None:
+    """Apply one-shot data migrations, tracked via PRAGMA user_version."""
+    with get_connection(write=True) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # v1: password hashes move from 64-char hex TEXT to raw 32-byte BLOBs.
+            rows = conn.execute(
+                "SELECT user_id, password FROM users "
+                "WHERE typeof(password) = 'text' AND length(password) = 64"
+            ).fetchall()
+            conn.executemany(
+                "UPDATE users SET password = ? WHERE user_id = ?",
+                [(bytes.fromhex(r["password"]), r["user_id"]) for r in rows],
+            )
+        if version < 2:
+            # v2: Fernet tokens are ASCII, so the cast keeps the exact token bytes.
+            conn.execute(
+                "UPDATE patients SET diagnosis = CAST(diagnosis AS BLOB) "
+                "WHERE typeof(diagnosis) = 'text'"
+            )
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    _notify_users_changed()
 
 
 def initialize_database() -> None:
     create_tables()
+    migrate_schema()
     seed_users()
+    # Refresh planner statistics so the indexes above are actually chosen.
+    with get_connection(write=True) as conn:
+        conn.execute("ANALYZE;")
 
 
 def get_db_path() -> Path:
@@ -131,6 +294,8 @@ def get_db_path() -> Path:
 
 
 def read_database_bytes() -> bytes:
+    # Fold pending WAL pages into the main file so the backup is complete.
+    _thread_connection().execute("PRAGMA wal_checkpoint(FULL);")
     return DB_PATH.read_bytes()
 
 
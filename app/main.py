@@ -1,32 +1,62 @@
 """Streamlit entry point for GDPR-aware hospital dashboard."""
 from __future__ import annotations
 
-import sys
 import time
-from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Optional
 
 import pandas as pd
 import streamlit as st
 
-FILE_DIR = Path(__file__).resolve().parent
-PROJECT_ROOT = FILE_DIR.parent
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.append(str(PROJECT_ROOT))
-
 try:
-    from . import db 
-    from .services import auth_service, log_service, patient_service 
-except ImportError:
-    import db
-    from services import auth_service, log_service, patient_service
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+from app import db
+from app.services import auth_service, log_service, patient_service
+
+READ_CACHE_TTL_SECONDS = 30
+# Every distinct Doctor View search term is its own cache entry.
+READ_CACHE_MAX_ENTRIES = 32
+# Monotonic so uptime is immune to wall-clock (NTP) adjustments.
+time_monotonic = time.monotonic
+
+
+@st.cache_data(ttl=READ_CACHE_TTL_SECONDS, max_entries=READ_CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_list_patients(
+    view: str, user: Dict[str, str], search: Optional[str] = None
+) -> pd.DataFrame:
+    # The user is part of the cache key, so role checks still apply per user.
+    return patient_service.list_patients_df(view=view, requested_by=user, search=search)
+
+
+@st.cache_data(ttl=READ_CACHE_TTL_SECONDS, max_entries=READ_CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_list_logs(limit: int) -> pd.DataFrame:
+    return log_service.list_logs_df(limit=limit)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _df_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    # Keyed on the frame's content, so serialization only reruns when data changes.
+    if pa is None:
+        return df.to_csv(index=False).encode("utf-8")
+    # Arrow's CSV writer is implemented in C++ and multi-threaded.
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), sink)
+    return sink.getvalue().to_pybytes()
+
+
+def _invalidate_cached_reads() -> None:
+    _cached_list_patients.clear()
+    _cached_list_logs.clear()
 
 
 def ensure_session_defaults() -> None:
     if "current_user" not in st.session_state:
         st.session_state["current_user"] = None
     if "app_start_time" not in st.session_state:
-        st.session_state["app_start_time"] = time.time()
+        st.session_state["app_start_time"] = time_monotonic()
     if "login_error" not in st.session_state:
         st.session_state["login_error"] = ""
     if "consent_ack" not in st.session_state:
@@ -88,17 +118,15 @@ def sidebar_controls(current_user: Dict[str, str]) -> str:
     return selection
 
 
-def _render_patient_table(title: str, data: List[Dict]) -> None:
+def _render_patient_table(title: str, df: pd.DataFrame) -> None:
     st.subheader(title)
-    if not data:
+    if df.empty:
         st.info("No records available.")
         return
-    df = pd.DataFrame(data)
     st.dataframe(df, use_container_width=True, hide_index=True)
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
     st.download_button(
         label=f"Download {title} CSV",
-        data=csv_bytes,
+        data=_df_to_csv_bytes(df),
         file_name=f"{title.lower().replace(' ', '_')}.csv",
         mime="text/csv",
     )
@@ -112,13 +140,11 @@ def render_admin_panel(user: Dict[str, str]) -> None:
     st.header("Admin Dashboard")
 
     col1, col2 = st.columns(2)
-    raw_patients: List[Dict]
-    anonymized_patients: List[Dict]
+    raw_patients: pd.DataFrame
+    anonymized_patients: pd.DataFrame
     try:
-        raw_patients = patient_service.list_patients(view="raw", requested_by=user)
-        anonymized_patients = patient_service.list_patients(
-            view="anonymized", requested_by=user
-        )
+        raw_patients = _cached_list_patients("raw", user)
+        anonymized_patients = _cached_list_patients("anonymized", user)
     except PermissionError as exc:
         st.error(str(exc))
         return
@@ -131,14 +157,13 @@ def render_admin_panel(user: Dict[str, str]) -> None:
     with col2:
         _render_patient_table("Anonymized Patient Data", anonymized_patients)
 
-    retention_days = [
-        r["retention_days_remaining"]
-        for r in raw_patients
-        if isinstance(r.get("retention_days_remaining"), int)
-    ]
-    if retention_days:
-        soonest = min(retention_days)
-        expiring = sum(1 for d in retention_days if d <= 7)
+    if "retention_days_remaining" in raw_patients:
+        retention_days = raw_patients["retention_days_remaining"].dropna()
+    else:
+        retention_days = pd.Series(dtype="int64")
+    if not retention_days.empty:
+        soonest = int(retention_days.min())
+        expiring = int((retention_days <= 7).sum())
         st.info(
             f"Retention policy: {len(retention_days)} records tracked. "
             f"{expiring} records expire within 7 days. Soonest expiry in {soonest} days."
@@ -153,21 +178,21 @@ def render_admin_panel(user: Dict[str, str]) -> None:
             st.error(f"Unable to refresh anonymized data: {exc}")
         else:
             st.success("Anonymized fields refreshed.")
+            _invalidate_cached_reads()
             st.rerun()
 
     st.subheader("Audit Logs")
     try:
-        logs = log_service.list_logs(limit=200)
+        logs_df = _cached_list_logs(200)
     except Exception as exc:
         st.error(f"Unable to load logs: {exc}")
-        logs = []
+        logs_df = pd.DataFrame()
 
-    if logs:
-        logs_df = pd.DataFrame(logs)
+    if not logs_df.empty:
         st.dataframe(logs_df, use_container_width=True, hide_index=True)
         st.download_button(
             "Download Logs CSV",
-            logs_df.to_csv(index=False).encode("utf-8"),
+            _df_to_csv_bytes(logs_df),
             file_name="audit_logs.csv",
             mime="text/csv",
         )
@@ -198,25 +223,15 @@ def render_doctor_view(user: Dict[str, str]) -> None:
         return
 
     st.header("Doctor View")
+    search = st.text_input("Search anonymized name or diagnosis code")
     try:
-        anonymized_patients = patient_service.list_patients(
-            view="anonymized", requested_by=user
-        )
+        anonymized_patients = _cached_list_patients("anonymized", user, search or None)
     except PermissionError as exc:
         st.error(str(exc))
         return
     except Exception as exc:
         st.error(f"Unable to load anonymized data: {exc}")
         return
-    search = st.text_input("Search anonymized name or diagnosis code")
-    if search:
-        search_lower = search.lower()
-        anonymized_patients = [
-            p
-            for p in anonymized_patients
-            if search_lower in p["anonymized_name"].lower()
-            or search_lower in p["diagnosis_masked"].lower()
-        ]
 
     _render_patient_table("Anonymized Patients", anonymized_patients)
 
@@ -249,19 +264,20 @@ def render_receptionist_workspace(user: Dict[str, str]) -> None:
                     st.error(f"Unable to create patient: {exc}")
                 else:
                     st.success(f"Patient record created with ID {patient_id}.")
+                    _invalidate_cached_reads()
                     st.rerun()
 
     st.markdown("---")
     st.subheader("Update Existing Patient")
     try:
-        patients = patient_service.list_patients(view="raw", requested_by=user)
+        patients = _cached_list_patients("raw", user)
     except PermissionError as exc:
         st.error(str(exc))
         return
     except Exception as exc:
         st.error(f"Unable to load patients for editing: {exc}")
         return
-    patient_ids = [p["patient_id"] for p in patients]
+    patient_ids = patients["patient_id"].tolist()
     if not patient_ids:
         st.info("No patients available to update.")
         return
@@ -294,11 +310,12 @@ def render_receptionist_workspace(user: Dict[str, str]) -> None:
                     st.error(f"Unable to update patient: {exc}")
                 else:
                     st.success(f"Patient #{patient_choice} updated.")
+                    _invalidate_cached_reads()
                     st.rerun()
 
 
 def render_footer() -> None:
-    uptime_seconds = int(time.time() - st.session_state["app_start_time"])
+    uptime_seconds = int(time_monotonic() - st.session_state["app_start_time"])
     hours, remainder = divmod(uptime_seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
     db_ok = db.health_check()
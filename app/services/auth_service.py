@@ -2,55 +2,92 @@
 from __future__ import annotations
 
 import hashlib
-import sys
-from pathlib import Path
-from typing import Any, Dict, Optional
-
-FILE_DIR = Path(__file__).resolve().parent
-PROJECT_ROOT = FILE_DIR.parents[1]
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.append(str(PROJECT_ROOT))
-
-try:
-    from ..db import get_connection  # type: ignore
-except ImportError:
-    from db import get_connection
-
-try:
-    from .log_service import log_action  # type: ignore
-except ImportError:
-    from log_service import log_action
-
-
-def hash_password(raw_password: str) -> str:
-    return hashlib.sha256(raw_password.encode("utf-8")).hexdigest()
-
-
-def verify_password(raw_password: str, hashed_password: str) -> bool:
-    return hash_password(raw_password) == hashed_password
-
-
-def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
+import hmac
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+
+from app.db import get_connection, on_users_changed
+from app.services.log_service import log_action
+
+# Bounds staleness when the users table is changed by another process.
+USER_CACHE_TTL_SECONDS = 30
+USER_CACHE_SIZE = 256
+
+_sha256 = hashlib.sha256
+_user_cache: Dict[Tuple[str, Any], Tuple[float, Mapping[str, Any]]] = {}
+
+
+def hash_password(raw_password: str) -> bytes:
+    return _sha256(raw_password.encode("utf-8")).digest()
+
+
+def verify_password(raw_password: str, hashed_password: Union[bytes, str]) -> bool:
+    """Constant-time comparison of the raw SHA-256 digest against the stored hash."""
+    if isinstance(hashed_password, str):
+        # Legacy hex storage from before the BLOB migration.
+        try:
+            hashed_password = bytes.fromhex(hashed_password)
+        except ValueError:
+            return False
+    return hmac.compare_digest(hash_password(raw_password), hashed_password)
+
+
+def _cached_user(
+    kind: str, key: Any, load: Callable[[Any], Optional[Mapping[str, Any]]]
+) -> Optional[Mapping[str, Any]]:
+    """Return a memoized lookup younger than USER_CACHE_TTL_SECONDS; misses are not cached."""
+    now = time.monotonic()
+    hit = _user_cache.get((kind, key))
+    if hit and now - hit[0] < USER_CACHE_TTL_SECONDS:
+        return hit[1]
+    user = load(key)
+    if user is not None:
+        if len(_user_cache) >= USER_CACHE_SIZE:
+            _user_cache.clear()
+        _user_cache[(kind, key)] = (now, user)
+    return user
+
+
+def _load_user_by_username(username: str) -> Optional[Mapping[str, Any]]:
     with get_connection() as conn:
         cursor = conn.execute(
             "SELECT user_id, username, password, role FROM users WHERE username = ?",
-            (username.lower(),),
+            (username,),
         )
         row = cursor.fetchone()
-        return dict(row) if row else None
+        # Read-only so callers cannot corrupt the cache.
+        return MappingProxyType(dict(row)) if row else None
 
 
-def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
+def _load_user_by_id(user_id: int) -> Optional[Mapping[str, Any]]:
     with get_connection() as conn:
         cursor = conn.execute(
             "SELECT user_id, username, role FROM users WHERE user_id = ?", (user_id,)
         )
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return MappingProxyType(dict(row)) if row else None
+
+
+def get_user_by_username(username: str) -> Optional[Mapping[str, Any]]:
+    return _cached_user("username", username.lower(), _load_user_by_username)
+
+
+def get_user_by_id(user_id: int) -> Optional[Mapping[str, Any]]:
+    return _cached_user("user_id", user_id, _load_user_by_id)
+
+
+@on_users_changed
+def clear_user_cache() -> None:
+    """Drop memoized user lookups; runs automatically after app.db writes to users."""
+    _user_cache.clear()
 
 
 def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
-    """Validate credentials and log the login attempt."""
+    """Validate credentials and log the login attempt.
+
+    The user row may come from cache, but the password is verified on every call.
+    """
     user = get_user_by_username(username)
     if not user:
         return None
@@ -1,55 +1,205 @@
 """Log service for recording and retrieving audit events."""
 from __future__ import annotations
 
-import sys
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-FILE_DIR = Path(__file__).resolve().parent
-PROJECT_ROOT = FILE_DIR.parents[1]
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.append(str(PROJECT_ROOT))
+import pandas as pd
 
-try:
-    from ..db import get_connection  # type: ignore
-except ImportError:
-    from db import get_connection
+from app.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+LogEntry = Tuple[int, str, str, Optional[str]]
+
+FLUSH_INTERVAL_SECONDS = 0.05
+FLUSH_BATCH_SIZE = 500
+
+_INSERT_LOG = """
+    INSERT INTO logs (user_id, role, action, details)
+    VALUES (?, ?, ?, ?)
+"""
+_SELECT_LOGS = """
+    SELECT log_id, user_id, role, action, details, timestamp
+    FROM logs
+    {where}
+    ORDER BY timestamp DESC, log_id DESC
+    LIMIT ?
+"""
+_SELECT_LOGS_ALL = _SELECT_LOGS.format(where="")
+_SELECT_LOGS_BY_ROLE = _SELECT_LOGS.format(where="WHERE role = ?")
+_SELECT_LOGS_BY_USER = _SELECT_LOGS.format(where="WHERE user_id = ?")
+_SELECT_LOGS_BY_ROLE_AND_USER = _SELECT_LOGS.format(where="WHERE role = ? AND user_id = ?")
+_LOG_QUEUE: "queue.SimpleQueue[object]" = queue.SimpleQueue()
+_STOP = object()
+# Ends the writer's current batch early; only the writer ever touches the table,
+# so log_id order always matches enqueue order.
+_FLUSH = object()
+_pending = 0
+_failed = 0
+_pending_cond = threading.Condition()
+
+
+def _insert_logs(batch: List[LogEntry]) -> None:
+    with get_connection(write=True) as conn:
+        conn.executemany(_INSERT_LOG, batch)
+
+
+def _write_batch(batch: List[LogEntry]) -> int:
+    """Insert ``batch``; returns how many entries could not be stored."""
+    try:
+        _insert_logs(batch)
+        return 0
+    except sqlite3.Error:
+        if len(batch) == 1:
+            logger.exception("Failed to persist log entry %r", batch[0])
+            return 1
+    # One bad row (e.g. an unknown user_id) must not take the whole batch with it.
+    failed = 0
+    for entry in batch:
+        try:
+            _insert_logs([entry])
+        except sqlite3.Error:
+            logger.exception("Failed to persist log entry %r", entry)
+            failed += 1
+    return failed
+
+
+def _mark_done(count: int, failed: int = 0) -> None:
+    global _pending, _failed
+    with _pending_cond:
+        _pending -= count
+        _failed += failed
+        _pending_cond.notify_all()
+
+
+def _wait_for_writer(timeout: float) -> bool:
+    _LOG_QUEUE.put(_FLUSH)
+    with _pending_cond:
+        return _pending_cond.wait_for(lambda: _pending <= 0, timeout=timeout)
+
+
+def _log_writer() -> None:
+    """Drain the queue, writing every FLUSH_BATCH_SIZE rows or FLUSH_INTERVAL_SECONDS."""
+    stopping = False
+    while not stopping:
+        item = _LOG_QUEUE.get()
+        if item is _STOP:
+            return
+        if item is _FLUSH:
+            continue
+        batch: List[LogEntry] = [item]  # type: ignore[list-item]
+        deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+        while len(batch) < FLUSH_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _LOG_QUEUE.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            if item is _FLUSH:
+                break
+            batch.append(item)  # type: ignore[arg-type]
+        failed = len(batch)
+        try:
+            # The caller has already returned; failed entries are dropped, not retried.
+            failed = _write_batch(batch)
+        except Exception:
+            logger.exception("Failed to persist %d log entries", len(batch))
+        finally:
+            _mark_done(len(batch), failed)
+
+
+_WRITER = threading.Thread(target=_log_writer, name="log-writer", daemon=True)
+_WRITER.start()
 
 
 def log_action(user_id: int, role: str, action: str, details: Optional[str] = None) -> None:
-    """Persist a log entry for a critical user action."""
-    with get_connection() as conn:
-        conn.execute(
-            """
-            INSERT INTO logs (user_id, role, action, details)
-            VALUES (?, ?, ?, ?)
-            """,
-            (user_id, role, action, details),
-        )
+    """Queue a log entry for a critical user action; written in the background."""
+    global _pending
+    with _pending_cond:
+        _pending += 1
+    _LOG_QUEUE.put((user_id, role, action, details))
 
 
-def list_logs(limit: int = 100, role: Optional[str] = None, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
-    """Return most recent logs, optionally filtered by role or user."""
-    params = []
-    clauses = []
-    if role:
-        clauses.append("role = ?")
-        params.append(role)
-    if user_id:
-        clauses.append("user_id = ?")
-        params.append(user_id)
-
-    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
-    sql = f"""
-        SELECT log_id, user_id, role, action, details, timestamp
-        FROM logs
-        {where}
-        ORDER BY timestamp DESC
-        LIMIT ?
+def log_action_sync(
+    user_id: int, role: str, action: str, details: Optional[str] = None, timeout: float = 1.0
+) -> None:
+    """Persist a log entry before returning; raises if it could not be stored.
+
+    Entries already queued are written first, so this one gets a later log_id.
+    """
+    if not _wait_for_writer(timeout):
+        raise TimeoutError("Timed out waiting for queued audit log entries")
+    _insert_logs([(user_id, role, action, details)])
+
+
+def flush_logs(timeout: float = 1.0) -> bool:
+    """Ask the writer to persist queued entries now and wait until it has.
+
+    Returns False if the wait timed out or any entry failed to persist meanwhile.
     """
-    params.append(limit)
+    with _pending_cond:
+        failed_before = _failed
+    drained = _wait_for_writer(timeout)
+    with _pending_cond:
+        return drained and _failed == failed_before
+
+
+@atexit.register
+def _shutdown_writer() -> None:
+    _LOG_QUEUE.put(_STOP)
+    _WRITER.join(timeout=5)
+    if _WRITER.is_alive():
+        return
+    # Entries queued behind _STOP; the writer is gone, so order is still preserved.
+    batch: List[LogEntry] = []
+    while True:
+        try:
+            item = _LOG_QUEUE.get_nowait()
+        except queue.Empty:
+            break
+        if item is not _STOP and item is not _FLUSH:
+            batch.append(item)  # type: ignore[arg-type]
+    if batch:
+        _mark_done(len(batch), _write_batch(batch))
+
+
+def _query_logs(limit: int, role: Optional[str], user_id: Optional[int]) -> Tuple[List[str], List[Any]]:
+    flush_logs()
+    # Fixed statement text per filter combination keeps SQLite's statement cache warm.
+    if role and user_id:
+        sql, params = _SELECT_LOGS_BY_ROLE_AND_USER, (role, user_id, limit)
+    elif role:
+        sql, params = _SELECT_LOGS_BY_ROLE, (role, limit)
+    elif user_id:
+        sql, params = _SELECT_LOGS_BY_USER, (user_id, limit)
+    else:
+        sql, params = _SELECT_LOGS_ALL, (limit,)
 
     with get_connection() as conn:
         cursor = conn.execute(sql, params)
-        return [dict(row) for row in cursor.fetchall()]
+        # LIMIT already bounds the result; size the fetch buffer to match it.
+        cursor.arraysize = max(limit, 1)
+        return [c[0] for c in cursor.description], cursor.fetchmany(limit)
+
+
+def list_logs(limit: int = 100, role: Optional[str] = None, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return most recent logs, optionally filtered by role or user."""
+    _, rows = _query_logs(limit, role, user_id)
+    return list(map(dict, rows))
+
 
+def list_logs_df(limit: int = 100, role: Optional[str] = None, user_id: Optional[int] = None) -> pd.DataFrame:
+    """DataFrame variant of ``list_logs`` built straight from the cursor rows."""
+    columns, rows = _query_logs(limit, role, user_id)
+    return pd.DataFrame.from_records(rows, columns=columns)
@@ -1,27 +1,30 @@
 """Patient data service: CRUD plus masking/anonymization utilities."""
 from __future__ import annotations
 
+import hashlib
 import os
-import sys
+import secrets
+from contextlib import closing
 from datetime import datetime, timedelta
+from itertools import chain
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.db import get_connection, get_read_connection
+from app.services.log_service import log_action
 
 FILE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = FILE_DIR.parents[1]
 DATA_DIR = PROJECT_ROOT / "data"
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.append(str(PROJECT_ROOT))
 
+# rfernet is a Rust Fernet implementation producing interoperable tokens; it is
+# several times faster for small payloads, so it is preferred when installed.
 try:
-    from ..db import get_connection  # type: ignore
-except ImportError:
-    from db import get_connection
-
-try:
-    from .log_service import log_action  # type: ignore
-except ImportError:
-    from log_service import log_action
+    from rfernet import Fernet as RFernet
+except ImportError:  # pragma: no cover - optional dependency
+    RFernet = None
 
 try:
     from cryptography.fernet import Fernet
@@ -32,54 +35,146 @@ FERNET_KEY = os.getenv("FERNET_KEY")
 FERNET = None
 FERNET_KEY_PATH = DATA_DIR / "fernet.key"
 
-if not FERNET_KEY and Fernet:
+if not FERNET_KEY and (RFernet or Fernet):
     if FERNET_KEY_PATH.exists():
         FERNET_KEY = FERNET_KEY_PATH.read_text().strip()
     else:
         DATA_DIR.mkdir(parents=True, exist_ok=True)
-        generated_key = Fernet.generate_key().decode("utf-8")
+        if RFernet:
+            generated_key = RFernet.generate_new_key()
+        else:
+            generated_key = Fernet.generate_key().decode("utf-8")
         FERNET_KEY_PATH.write_text(generated_key)
         FERNET_KEY = generated_key
 
-if FERNET_KEY and Fernet:
+if FERNET_KEY and (RFernet or Fernet):
     try:
-        FERNET = Fernet(FERNET_KEY)
+        FERNET = RFernet(FERNET_KEY) if RFernet else Fernet(FERNET_KEY)
     except ValueError:
         FERNET = None
 
-
 RETENTION_DAYS = int(os.getenv("DATA_RETENTION_DAYS", "90"))
 RAW_VIEW_ROLES: Set[str] = {"admin", "receptionist"}
 ANON_VIEW_ROLES: Set[str] = {"admin", "doctor"}
 WRITE_ROLES: Set[str] = {"admin", "receptionist"}
 DELETE_ROLES: Set[str] = {"admin"}
+REFRESH_CHUNK_SIZE = 10_000
+STREAM_CHUNK_SIZE = 500
+
+# SQL is kept as fixed module-level text so sqlite3's statement cache reuses it.
+_RAW_COLUMNS = """patient_id, name, contact, diagnosis,
+               anonymized_name, anonymized_contact, diagnosis_masked,
+               date_added, last_updated"""
+# LIKE is case-insensitive for ASCII in SQLite.
+_SEARCH_CLAUSE = "WHERE anonymized_name LIKE ? ESCAPE '\\' OR diagnosis_masked LIKE ? ESCAPE '\\'"
+_SQL_LIST = """
+        SELECT {columns}
+        FROM {source}
+        {where}
+        ORDER BY date_added DESC
+"""
+_SQL_LIST_RAW = _SQL_LIST.format(columns=_RAW_COLUMNS, source="patients", where="")
+_SQL_LIST_RAW_SEARCH = _SQL_LIST.format(columns=_RAW_COLUMNS, source="patients", where=_SEARCH_CLAUSE)
+# The patients_anon view (see db.create_tables) never exposes the diagnosis column.
+_SQL_LIST_ANON = _SQL_LIST.format(columns="*", source="patients_anon", where="")
+_SQL_LIST_ANON_SEARCH = _SQL_LIST.format(columns="*", source="patients_anon", where=_SEARCH_CLAUSE)
+_SQL_GET = f"SELECT {_RAW_COLUMNS} FROM patients WHERE patient_id = ?"
+_SQL_INSERT_MANY = """
+    INSERT INTO patients (name, contact, diagnosis,
+                          anonymized_name, anonymized_contact, diagnosis_masked)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+# executemany cannot take RETURNING, so only the single-row insert adds it.
+_SQL_INSERT = _SQL_INSERT_MANY + "    RETURNING patient_id\n"
+_SQL_UPDATE = """
+    UPDATE patients
+    SET name = ?, contact = ?, diagnosis = ?,
+        anonymized_name = ?, anonymized_contact = ?, diagnosis_masked = ?,
+        last_updated = CURRENT_TIMESTAMP
+    WHERE patient_id = ?
+"""
+_SQL_DELETE = "DELETE FROM patients WHERE patient_id = ?"
+_SQL_REFRESH_SELECT = """
+    SELECT patient_id, name, contact, diagnosis,
+           anonymized_name, anonymized_contact, diagnosis_masked
+    FROM patients
+"""
+_SQL_REFRESH_UPDATE = """
+    UPDATE patients
+    SET anonymized_name = ?, anonymized_contact = ?, diagnosis_masked = ?,
+        last_updated = CURRENT_TIMESTAMP
+    WHERE patient_id = ?
+"""
+
+
+_blake = hashlib.blake2b
+# Secret used as the blake2b key so masks cannot be reversed by hashing guesses.
+# Never empty: like the Fernet key it is generated and persisted on first run.
+# Changing it changes every mask; run refresh_anonymized_fields afterwards.
+MASK_KEY_PATH = DATA_DIR / "mask.key"
+MASK_SALT = os.getenv("MASK_SALT")
+if not MASK_SALT:
+    if MASK_KEY_PATH.exists():
+        MASK_SALT = MASK_KEY_PATH.read_text().strip()
+    else:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        MASK_SALT = secrets.token_hex(32)
+        MASK_KEY_PATH.write_text(MASK_SALT)
+if not MASK_SALT:
+    raise RuntimeError(f"MASK_SALT is empty and {MASK_KEY_PATH} holds no key")
+_MASK_SALT = MASK_SALT.encode("utf-8")[:64]
 
 
 def mask_name(name: str) -> str:
-    suffix = abs(hash(name)) % 10000
-    return f"ANON_{suffix:04d}"
+    # blake2b is stable across processes, unlike the per-process builtin hash().
+    return "ANON_" + _blake(name.encode("utf-8"), digest_size=2, key=_MASK_SALT).hexdigest()
+
+
+# Deletes every non-digit ASCII character in a single C-level pass.
+_NONDIGIT_TABLE = str.maketrans("", "", "".join(chr(c) for c in range(128) if not chr(c).isdigit()))
 
 
 def mask_contact(contact: str) -> str:
-    digits = [c for c in contact if c.isdigit()]
-    last_four = "".join(digits[-4:]) or "0000"
-    return f"XXX-XXX-{last_four}"
+    if contact.isascii():
+        last_four = contact.translate(_NONDIGIT_TABLE)[-4:] or "0000"
+    else:
+        # Non-ASCII input may contain other Unicode digits; keep str.isdigit semantics.
+        digits = [c for c in contact if c.isdigit()]
+        last_four = "".join(digits[-4:]) or "0000"
+    return "XXX-XXX-" + last_four
 
 
 def mask_diagnosis(diagnosis: str) -> str:
-    return f"MASKED_{abs(hash(diagnosis)) % 1_000_000:06d}"
+    return "MASKED_" + _blake(diagnosis.encode("utf-8"), digest_size=3, key=_MASK_SALT).hexdigest()
+
+
+# Pick the implementation once at import so the per-row path never branches.
+# Tokens are stored as BLOBs, so the cryptography backend hands its bytes to
+# SQLite as-is instead of round-tripping them through str.
+if FERNET and RFernet:
+    # rfernet only speaks str tokens; they are ASCII, so the conversion is a copy.
+
+    def encrypt_sensitive(value: str, _encrypt=FERNET.encrypt) -> bytes:
+        return _encrypt(value.encode("utf-8")).encode("ascii")
+
+    def decrypt_sensitive(value: bytes, _decrypt=FERNET.decrypt) -> str:
+        return _decrypt(value.decode("ascii")).decode("utf-8")
+
+elif FERNET:
 
+    def encrypt_sensitive(value: str, _encrypt=FERNET.encrypt) -> bytes:
+        return _encrypt(value.encode("utf-8"))
 
-def encrypt_sensitive(value: str) -> str:
-    if FERNET:
-        return FERNET.encrypt(value.encode("utf-8")).decode("utf-8")
-    return value
+    def decrypt_sensitive(value: bytes, _decrypt=FERNET.decrypt) -> str:
+        return _decrypt(value).decode("utf-8")
 
+else:
 
-def decrypt_sensitive(value: str) -> str:
-    if FERNET:
-        return FERNET.decrypt(value.encode("utf-8")).decode("utf-8")
-    return value
+    def encrypt_sensitive(value: str) -> bytes:
+        return value.encode("utf-8")
+
+    def decrypt_sensitive(value: bytes) -> str:
+        return value.decode("utf-8")
 
 
 def _log_security_event(action: str, acted_by: Optional[Dict[str, Any]], details: str) -> None:
@@ -98,11 +193,26 @@ def _require_role(acted_by: Optional[Dict[str, Any]], allowed_roles: Set[str], a
         raise PermissionError(f"Role not permitted to {action}.")
 
 
-def _format_patient_row(row) -> Dict[str, Any]:
-    record = dict(row)
-    record["diagnosis"] = decrypt_sensitive(record["diagnosis"])
+def decrypt_many(values: List[bytes]) -> List[str]:
+    """Decrypt a batch of diagnosis tokens; same semantics as ``decrypt_sensitive``."""
+    return [decrypt_sensitive(v) for v in values]
+
+
+def _format_patient_row(row, diagnosis: Optional[str] = None) -> Dict[str, Any]:
+    """Build the output dict in one literal; ``row`` must follow _RAW_COLUMNS order."""
+    record = {
+        "patient_id": row[0],
+        "name": row[1],
+        "contact": row[2],
+        "diagnosis": decrypt_sensitive(row[3]) if diagnosis is None else diagnosis,
+        "anonymized_name": row[4],
+        "anonymized_contact": row[5],
+        "diagnosis_masked": row[6],
+        "date_added": row[7],
+        "last_updated": row[8],
+    }
     if RETENTION_DAYS:
-        added_str = record.get("date_added")
+        added_str = record["date_added"]
         if added_str:
             try:
                 added_dt = datetime.fromisoformat(str(added_str))
@@ -118,51 +228,124 @@ def _format_patient_row(row) -> Dict[str, Any]:
     return record
 
 
-def list_patients(*, view: str = "raw", requested_by: Dict[str, Any]) -> List[Dict[str, Any]]:
-    if view not in {"raw", "anonymized"}:
-        raise ValueError("view must be either 'raw' or 'anonymized'")
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
 
-    if view == "raw":
-        _require_role(requested_by, RAW_VIEW_ROLES, "view raw patients")
-    else:
-        _require_role(requested_by, ANON_VIEW_ROLES, "view anonymized patients")
 
-    sql = """
-        SELECT patient_id, name, contact, diagnosis,
-               anonymized_name, anonymized_contact, diagnosis_masked,
-               date_added, last_updated
-        FROM patients
-        ORDER BY date_added DESC
+def _project_raw_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    diagnoses = decrypt_many([r[3] for r in rows])
+    return [_format_patient_row(row, plain) for row, plain in zip(rows, diagnoses)]
+
+
+def _project_anon_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    return list(map(dict, rows))
+
+
+_RowProjection = Callable[[List[Any]], List[Dict[str, Any]]]
+
+# view -> (allowed roles, action label, SQL, search SQL, chunk projection)
+_VIEWS: Dict[str, Tuple[Set[str], str, str, str, _RowProjection]] = {
+    "raw": (RAW_VIEW_ROLES, "view raw patients", _SQL_LIST_RAW, _SQL_LIST_RAW_SEARCH, _project_raw_rows),
+    "anonymized": (
+        ANON_VIEW_ROLES,
+        "view anonymized patients",
+        _SQL_LIST_ANON,
+        _SQL_LIST_ANON_SEARCH,
+        _project_anon_rows,
+    ),
+}
+
+
+def _patients_query(
+    view: str, requested_by: Dict[str, Any], search: Optional[str]
+) -> Tuple[str, List[str], _RowProjection]:
+    """Role-check and resolve ``view``; returns (sql, params, projection)."""
+    try:
+        roles, action, sql, search_sql, project = _VIEWS[view]
+    except KeyError:
+        raise ValueError("view must be either 'raw' or 'anonymized'") from None
+
+    _require_role(requested_by, roles, action)
+    if search:
+        return search_sql, [_like_pattern(search)] * 2, project
+    return sql, [], project
+
+
+def _read_chunks(cursor: Any) -> Iterator[List[Any]]:
+    try:
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _patient_chunks(sql: str, params: List[str]) -> Tuple[List[str], Iterator[List[Any]]]:
+    """Execute ``sql``; return its column names and lazy STREAM_CHUNK_SIZE row chunks.
+
+    Not inside get_connection(): a transaction held across ``yield`` would be
+    joined by the caller's writes and rolled back if the iterator is closed.
     """
-    with get_connection() as conn:
-        cursor = conn.execute(sql)
-        rows = cursor.fetchall()
+    cursor = get_read_connection().execute(sql, params)
+    cursor.arraysize = STREAM_CHUNK_SIZE
+    return [c[0] for c in cursor.description], _read_chunks(cursor)
+
+
+def _stream_patients(chunks: Iterator[List[Any]], project: _RowProjection) -> Iterator[Dict[str, Any]]:
+    with closing(chunks):
+        for rows in chunks:
+            yield from project(rows)
+
+
+def iter_patients(
+    *, view: str = "raw", requested_by: Dict[str, Any], search: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream patients, fetching and decrypting STREAM_CHUNK_SIZE rows at a time.
+
+    The role check and query run immediately. The read holds no explicit
+    transaction, so writes made while iterating commit independently of it; the
+    stream shares this thread's connection, so rows this thread changes
+    mid-iteration may be skipped or seen twice. Use list_patients for a stable list.
+    """
+    sql, params, project = _patients_query(view, requested_by, search)
+    _, chunks = _patient_chunks(sql, params)
+    return _stream_patients(chunks, project)
+
 
-    records = [_format_patient_row(row) for row in rows]
+def list_patients(
+    *, view: str = "raw", requested_by: Dict[str, Any], search: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """List patients; ``search`` matches anonymized name or masked diagnosis."""
+    return list(iter_patients(view=view, requested_by=requested_by, search=search))
+
+
+def list_patients_df(
+    *, view: str = "raw", requested_by: Dict[str, Any], search: Optional[str] = None
+) -> pd.DataFrame:
+    """DataFrame variant of ``list_patients``, sharing its read path and projection."""
+    sql, params, project = _patients_query(view, requested_by, search)
+    names, chunks = _patient_chunks(sql, params)
     if view == "anonymized":
-        return [
-            {
-                "patient_id": r["patient_id"],
-                "anonymized_name": r["anonymized_name"],
-                "anonymized_contact": r["anonymized_contact"],
-                "diagnosis_masked": r["diagnosis_masked"],
-                "date_added": r["date_added"],
-            }
-            for r in records
-        ]
-    return records
+        # Nothing is derived for this view, so skip the per-row dicts entirely.
+        return pd.DataFrame.from_records(list(chain.from_iterable(chunks)), columns=names)
+
+    records = list(_stream_patients(chunks, project))
+    # The projection appends derived retention fields after the SQL columns.
+    return pd.DataFrame.from_records(records, columns=list(records[0]) if records else names)
 
 
 def get_patient(patient_id: int) -> Optional[Dict[str, Any]]:
     with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM patients WHERE patient_id = ?", (patient_id,)
-        )
+        cursor = conn.execute(_SQL_GET, (patient_id,))
         row = cursor.fetchone()
         return _format_patient_row(row) if row else None
 
 
 def _anonymized_fields(name: str, contact: str, diagnosis: str) -> Dict[str, str]:
+    # Deliberately not memoized: cache keys would keep plaintext PII in memory.
     return {
         "anonymized_name": mask_name(name),
         "anonymized_contact": mask_contact(contact),
@@ -176,13 +359,9 @@ def create_patient(
     _require_role(acted_by, WRITE_ROLES, "create patients")
     fields = _anonymized_fields(name, contact, diagnosis)
     encrypted_diagnosis = encrypt_sensitive(diagnosis)
-    with get_connection() as conn:
-        cursor = conn.execute(
-            """
-            INSERT INTO patients (name, contact, diagnosis,
-                                  anonymized_name, anonymized_contact, diagnosis_masked)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
+    with get_connection(write=True) as conn:
+        patient_id = conn.execute(
+            _SQL_INSERT,
             (
                 name,
                 contact,
@@ -191,8 +370,7 @@ def create_patient(
                 fields["anonymized_contact"],
                 fields["diagnosis_masked"],
             ),
-        )
-        patient_id = cursor.lastrowid
+        ).fetchone()[0]
 
     log_action(
         user_id=acted_by["user_id"],
@@ -203,21 +381,56 @@ def create_patient(
     return patient_id
 
 
+def create_patients_bulk(
+    records: Iterable[Mapping[str, str]], *, acted_by: Dict[str, Any]
+) -> List[int]:
+    """Insert many patients in one transaction; returns the new ids in input order.
+
+    Each record needs ``name``, ``contact`` and ``diagnosis``. A single aggregate
+    audit entry is written for the whole batch.
+    """
+    _require_role(acted_by, WRITE_ROLES, "create patients")
+    payload = []
+    for record in records:
+        name, contact, diagnosis = record["name"], record["contact"], record["diagnosis"]
+        fields = _anonymized_fields(name, contact, diagnosis)
+        payload.append(
+            (
+                name,
+                contact,
+                encrypt_sensitive(diagnosis),
+                fields["anonymized_name"],
+                fields["anonymized_contact"],
+                fields["diagnosis_masked"],
+            )
+        )
+    if not payload:
+        return []
+
+    with get_connection(write=True) as conn:
+        conn.executemany(_SQL_INSERT_MANY, payload)
+        # The transaction holds the write lock, so AUTOINCREMENT ids are contiguous.
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    patient_ids = list(range(last_id - len(payload) + 1, last_id + 1))
+
+    log_action(
+        user_id=acted_by["user_id"],
+        role=acted_by["role"],
+        action="create_patients_bulk",
+        details=f"count={len(patient_ids)}; patient_ids={patient_ids[0]}-{patient_ids[-1]}",
+    )
+    return patient_ids
+
+
 def update_patient(
     patient_id: int, *, name: str, contact: str, diagnosis: str, acted_by: Dict[str, Any]
 ) -> None:
     _require_role(acted_by, WRITE_ROLES, "update patients")
     fields = _anonymized_fields(name, contact, diagnosis)
     encrypted_diagnosis = encrypt_sensitive(diagnosis)
-    with get_connection() as conn:
+    with get_connection(write=True) as conn:
         conn.execute(
-            """
-            UPDATE patients
-            SET name = ?, contact = ?, diagnosis = ?,
-                anonymized_name = ?, anonymized_contact = ?, diagnosis_masked = ?,
-                last_updated = CURRENT_TIMESTAMP
-            WHERE patient_id = ?
-            """,
+            _SQL_UPDATE,
             (
                 name,
                 contact,
@@ -239,8 +452,8 @@ def update_patient(
 
 def delete_patient(patient_id: int, *, acted_by: Dict[str, Any]) -> None:
     _require_role(acted_by, DELETE_ROLES, "delete patients")
-    with get_connection() as conn:
-        conn.execute("DELETE FROM patients WHERE patient_id = ?", (patient_id,))
+    with get_connection(write=True) as conn:
+        conn.execute(_SQL_DELETE, (patient_id,))
 
     log_action(
         user_id=acted_by["user_id"],
@@ -253,29 +466,26 @@ def delete_patient(patient_id: int, *, acted_by: Dict[str, Any]) -> None:
 def refresh_anonymized_fields(*, acted_by: Dict[str, Any]) -> None:
     """Re-mask all patients, useful if rules change."""
     _require_role(acted_by, {"admin"}, "refresh anonymized data")
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT patient_id, name, contact, diagnosis FROM patients"
-        )
-        rows = cursor.fetchall()
-
-        for row in rows:
-            diagnosis_plain = decrypt_sensitive(row["diagnosis"])
-            new_fields = _anonymized_fields(row["name"], row["contact"], diagnosis_plain)
-            conn.execute(
-                """
-                UPDATE patients
-                SET anonymized_name = ?, anonymized_contact = ?, diagnosis_masked = ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE patient_id = ?
-                """,
-                (
-                    new_fields["anonymized_name"],
-                    new_fields["anonymized_contact"],
-                    new_fields["diagnosis_masked"],
-                    row["patient_id"],
-                ),
-            )
+    with get_connection(write=True) as conn:
+        # Drain the read cursor before writing; then update in bounded slices.
+        rows = conn.execute(_SQL_REFRESH_SELECT).fetchall()
+        for start in range(0, len(rows), REFRESH_CHUNK_SIZE):
+            chunk = rows[start : start + REFRESH_CHUNK_SIZE]
+            diagnoses = decrypt_many([r["diagnosis"] for r in chunk])
+            payload = []
+            for r, plain in zip(chunk, diagnoses):
+                fields = _anonymized_fields(r["name"], r["contact"], plain)
+                masks = (
+                    fields["anonymized_name"],
+                    fields["anonymized_contact"],
+                    fields["diagnosis_masked"],
+                )
+                # Skip no-op UPDATEs; they would still rewrite the row's page.
+                if masks != (r["anonymized_name"], r["anonymized_contact"], r["diagnosis_masked"]):
+                    payload.append((*masks, r["patient_id"]))
+            if not payload:
+                continue
+            conn.executemany(_SQL_REFRESH_UPDATE, payload)
 
     log_action(
         user_id=acted_by["user_id"],
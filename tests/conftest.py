@@ -0,0 +1,103 @@
+"""Shared test setup: point the app at a throwaway database before it is imported.
+
+The database starts out in the original (pre-migration) on-disk format (hex TEXT
+password hashes, TEXT diagnosis tokens), so the session-wide initialize_database()
+call exercises every migration step.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="hospital-tests-"))
+os.environ["DB_PATH"] = str(_TMP_DIR / "hospital.db")
+os.environ.setdefault("FERNET_KEY", "m7y3YgkB5VbZkl0LQg3Fyx7qfWzv9m0xP1Nz3Xg5mJQ=")
+os.environ.setdefault("MASK_SALT", "test-mask-key")
+
+LEGACY_USER = ("legacy_nurse", "LegacyPass123!", "receptionist")
+LEGACY_PATIENT = ("Legacy Patient", "555-000-1234", "Hypertension")
+
+_BASELINE_SCHEMA = """
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('admin', 'doctor', 'receptionist')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE patients (
+    patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    diagnosis TEXT NOT NULL,
+    anonymized_name TEXT NOT NULL,
+    anonymized_contact TEXT NOT NULL,
+    diagnosis_masked TEXT NOT NULL,
+    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    action TEXT NOT NULL,
+    details TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE RESTRICT
+);
+"""
+
+
+def _legacy_token(plaintext: str) -> str:
+    """Diagnosis as the baseline stored it: a str Fernet token, or plaintext without Fernet."""
+    key = os.environ["FERNET_KEY"]
+    try:
+        from cryptography.fernet import Fernet
+
+        return Fernet(key).encrypt(plaintext.encode("utf-8")).decode("utf-8")
+    except ImportError:
+        pass
+    try:
+        from rfernet import Fernet as RFernet
+
+        return RFernet(key).encrypt(plaintext.encode("utf-8"))
+    except ImportError:
+        return plaintext
+
+
+def _create_baseline_database(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(_BASELINE_SCHEMA)
+        username, password, role = LEGACY_USER
+        # Baseline stored SHA-256 hex digests as TEXT.
+        conn.execute(
+            "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+            (username, hashlib.sha256(password.encode("utf-8")).hexdigest(), role),
+        )
+        name, contact, diagnosis = LEGACY_PATIENT
+        conn.execute(
+            "INSERT INTO patients (name, contact, diagnosis, anonymized_name,"
+            " anonymized_contact, diagnosis_masked) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, contact, _legacy_token(diagnosis), "ANON_1", "XXX-XXX-1234", "MASKED_1"),
+        )
+
+
+_create_baseline_database(os.environ["DB_PATH"])
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from app import db
+
+    db.initialize_database()
+    return db
+
+
+@pytest.fixture
+def admin():
+    from app.services import auth_service
+
+    return auth_service.authenticate_user("admin", "ChangeMe123!")
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from app import db
+from app.services import log_service
+
+
+def _details(action):
+    rows = log_service.list_logs(limit=1000)
+    return [r["details"] for r in sorted(rows, key=lambda r: r["log_id"]) if r["action"] == action]
+
+
+def test_log_ids_follow_enqueue_order(admin):
+    for i in range(50):
+        log_service.log_action(admin["user_id"], admin["role"], "order_test", str(i))
+    assert _details("order_test") == [str(i) for i in range(50)]
+
+
+def test_log_action_sync_is_durable_and_ordered_after_queued_entries(admin):
+    log_service.log_action(admin["user_id"], admin["role"], "sync_test", "queued")
+    log_service.log_action_sync(admin["user_id"], admin["role"], "sync_test", "sync")
+
+    # Read straight from the table: list_logs would flush the queue itself.
+    with sqlite3.connect(db.DB_PATH) as conn:
+        rows = conn.execute(
+            "SELECT details FROM logs WHERE action = 'sync_test' ORDER BY log_id"
+        ).fetchall()
+    assert [r[0] for r in rows] == ["queued", "sync"]
+
+
+def test_log_action_sync_raises_when_entry_cannot_be_stored(admin):
+    with pytest.raises(sqlite3.IntegrityError):
+        log_service.log_action_sync(999_999, "admin", "sync_fail_test", "unknown user")
+    assert _details("sync_fail_test") == []
+
+
+def test_bad_entry_does_not_drop_its_batch(admin):
+    log_service.log_action(admin["user_id"], admin["role"], "batch_test", "before")
+    log_service.log_action(999_999, "admin", "batch_test", "unknown user")
+    log_service.log_action(admin["user_id"], admin["role"], "batch_test", "after")
+
+    assert log_service.flush_logs() is False
+    assert _details("batch_test") == ["before", "after"]
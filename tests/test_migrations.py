@@ -0,0 +1,40 @@
+"""The session database starts in the baseline format; see conftest."""
+import sqlite3
+
+from app import db
+from app.services import auth_service, patient_service
+from conftest import LEGACY_PATIENT, LEGACY_USER
+
+
+def _query(sql):
+    with sqlite3.connect(db.DB_PATH) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_schema_version_is_current():
+    assert _query("PRAGMA user_version") == [(db.SCHEMA_VERSION,)]
+
+
+def test_hex_password_hashes_become_blobs_and_still_log_in():
+    username, password, role = LEGACY_USER
+    assert _query("SELECT DISTINCT typeof(password) FROM users") == [("blob",)]
+
+    user = auth_service.authenticate_user(username, password)
+    assert user is not None and user["role"] == role
+    assert auth_service.authenticate_user(username, "wrong password") is None
+
+
+def test_text_diagnosis_tokens_become_blobs_and_still_decrypt(admin):
+    name, contact, diagnosis = LEGACY_PATIENT
+    assert _query("SELECT DISTINCT typeof(diagnosis) FROM patients") == [("blob",)]
+
+    (patient_id,) = _query(f"SELECT patient_id FROM patients WHERE name = '{name}'")[0]
+    assert patient_service.get_patient(patient_id)["diagnosis"] == diagnosis
+    frame = patient_service.list_patients_df(view="raw", requested_by=admin)
+    assert frame.loc[frame["patient_id"] == patient_id, "diagnosis"].tolist() == [diagnosis]
+
+
+def test_migrate_schema_is_idempotent():
+    username, password, _ = LEGACY_USER
+    db.migrate_schema()
+    assert auth_service.authenticate_user(username, password) is not None